@@ -47,3 +47,19 @@ utime.sleep(2)
 led.set(LED_NUMBER=0)
 led.setBrightness(LED_NUMBER=0, BRIGHTNESS=0.5)
 utime.sleep(2)
+
+'''
+   Batch several changes and send them to the strip at once
+'''
+led.set(LED_NUMBER=0, COLOR=led.RED, FLUSH=False)
+led.set(LED_NUMBER=1, COLOR=led.BLUE, FLUSH=False)
+led.flush()
+utime.sleep(2)
+
+'''
+   Send a frame in the background and wait for it to finish
+'''
+led.set(COLOR=led.CYAN, FLUSH=False)
+led.show()
+led.wait()
+utime.sleep(2)
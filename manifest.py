@@ -0,0 +1,7 @@
+# MicroPython manifest for freezing the driver into a custom RP2040 firmware
+# Build with: make -C ports/rp2 BOARD=RPI_PICO FROZEN_MANIFEST=/path/to/manifest.py
+
+# Keep the port's default frozen modules
+include("$(PORT_DIR)/boards/manifest.py")
+
+module("neopixel_rp2040.py", opt=3)
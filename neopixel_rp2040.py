@@ -3,9 +3,83 @@
 # Author: ShreyasK (https://github.com/shreyask21)
 
 import array
-import time
+import micropython
 from machine import Pin
-from rp2 import PIO, StateMachine, asm_pio
+from rp2 import DMA, PIO, StateMachine, asm_pio
+
+
+def _quantize(BRIGHTNESS: float) -> int:
+    """ Convert a brightness modifier into an integer scale factor (0-256).
+    Internal module function, not intended for external calling.
+    """
+    return min(max(int(BRIGHTNESS * 256), 0), 256)
+
+
+def _asyncio():
+    """ Import asyncio on first use, falling back to uasyncio on older firmware.
+    Internal module function, not intended for external calling.
+    """
+    try:
+        import asyncio
+    except ImportError:
+        import uasyncio as asyncio
+    return asyncio
+
+
+def _check_itemsize(BUFFER, SIZE: int, NAME: str):
+    """ Raise TypeError unless each element of BUFFER is SIZE bytes wide.
+    Internal module function, not intended for external calling.
+    """
+    # memoryview.itemsize is not built into the rp2 port, so measure one element
+    if(len(BUFFER) and len(bytes(memoryview(BUFFER)[:1])) != SIZE):
+        raise TypeError("%s must hold %d byte elements" % (NAME, SIZE))
+
+
+def _level(BRIGHTNESS: float) -> int:
+    """ Convert a brightness modifier into a per-LED level byte (0-255), scale is (level + 1)/256.
+    Internal module function, not intended for external calling.
+    """
+    return max(_quantize(BRIGHTNESS), 1) - 1
+
+
+@micropython.viper
+def _fill8(buf: ptr8, start: int, stop: int, value: int):
+    """ Store one byte into buf[start:stop].
+    Internal module function, not intended for external calling.
+    """
+    i = start
+    while i < stop:
+        buf[i] = value
+        i += 1
+
+
+@micropython.viper
+def _pack(planes: ptr8, dst: ptr32, n: int):
+    """ Interleave the G, R, B and level planes of n LEDs into GRB words (0xGGRRBB00) in dst.
+    Internal module function, not intended for external calling.
+    """
+    red = n
+    blue = 2 * n
+    level = 3 * n
+    i = 0
+    while i < n:
+        q = planes[level + i] + 1
+        dst[i] = ((planes[i] * q >> 8) << 24) | (
+            (planes[red + i] * q >> 8) << 16) | ((planes[blue + i] * q >> 8) << 8)
+        i += 1
+
+
+@micropython.viper
+def _encode(src: ptr8, dst: ptr32, n: int, q: int):
+    """ Pack n RGB byte triples from src into GRB words in dst, scaled by q/256.
+    Internal module function, not intended for external calling.
+    """
+    i = 0
+    while i < n:
+        j = i * 3
+        dst[i] = ((src[j + 1] * q >> 8) << 24) | (
+            (src[j] * q >> 8) << 16) | ((src[j + 2] * q >> 8) << 8)
+        i += 1
 
 
 class neopixel:
@@ -19,25 +93,55 @@ class neopixel:
     BLACK, RED, GREEN, BLUE, CYAN, MAGENTA, YELLOW, WHITE : int,
         24bit color value definations
 
-    COLORS : int [],
-        Above 24Bit colors in Array format
+    COLORS : int (),
+        Above 24Bit colors in Tuple format
 
     Methods
     -------
     RGB(R: int, G: int, B: int) -> int:,
         Get Combined 24Bit RGB Value
 
-    set(self, LED_NUMBER=None, START_LED=None, STOP_LED=None, R=0xFF, G=0xFF, B=0xFF, COLOR=None, BRIGHTNESS=1):,
+    set(self, LED_NUMBER=None, COLOR=None, BRIGHTNESS=1, *, START_LED=None, STOP_LED=None, R=0xFF, G=0xFF, B=0xFF, FLUSH=True):,
         Sets color for single, multiple or all LEDs
 
-    reset(self, LED_NUMBER=None, START_LED=None, STOP_LED=None):,
+    setAll(self, COLOR=WHITE, BRIGHTNESS=1, FLUSH=True):,
+        Sets color for all LEDs
+
+    setOne(self, LED_NUMBER, COLOR=WHITE, BRIGHTNESS=1, FLUSH=True):,
+        Sets color for a single LED
+
+    setRange(self, START_LED, STOP_LED, COLOR=WHITE, BRIGHTNESS=1, FLUSH=True):,
+        Sets color for a range of LEDs
+
+    reset(self, LED_NUMBER=None, START_LED=None, STOP_LED=None, FLUSH=True):,
         Resets single, multiple or all LEDs
 
-    setBrightness(self, LED_NUMBER=None, BRIGHTNESS=0.5,  START_LED=None, STOP_LED=None):,
+    setBrightness(self, LED_NUMBER=None, BRIGHTNESS=0.5,  START_LED=None, STOP_LED=None, FLUSH=True):,
         Changes brightness of single, multiple or all LEDs
 
+    flush(self):,
+        Sends the current colors of all LEDs to the strip
+
+    show(self):,
+        Starts sending the current colors of all LEDs to the strip without blocking
+
+    wait(self):,
+        Waits until a transfer started by show() has finished
+
+    deinit(self):,
+        Stops the state machine and releases the DMA channel used by show()
+
+    setRaw(self, BUFFER):,
+        Sends an already encoded buffer of GRB words to the strip
+
+    encodeGRB(self, RGB_BYTES, BUFFER, BRIGHTNESS=1):,
+        Encodes RGB byte triples into a buffer of GRB words for setRaw()
+
     test(self):,
         Tests All Connected LEDs, one at a time. Useful for debugging circuit faults.
+
+    testAsync(self):,
+        Coroutine version of test(), yields to other tasks between colors.
     """
     __numLED = 1  # Number of LEDs in series
     __dataPin = 22  # DIN Pin on RP2040
@@ -52,20 +156,23 @@ class neopixel:
         """
         return int(R << 16 | G << 8 | B)
 
-    # Color definitions
-    BLACK = RGB(0, 0, 0)
-    WHITE = RGB(255, 255, 255)
-    RED = RGB(255, 0, 0)
-    GREEN = RGB(0, 255, 0)
-    BLUE = RGB(0, 0, 255)
-    YELLOW = RGB(255, 255, 0)
-    MAGENTA = RGB(255, 0, 255)
-    CYAN = RGB(0, 255, 255)
-    COLORS = [BLACK, RED, GREEN, BLUE, CYAN, MAGENTA, YELLOW, WHITE]
+    # Color definitions, written out so no code runs for them at import
+    BLACK = 0x000000
+    WHITE = 0xFFFFFF
+    RED = 0xFF0000
+    GREEN = 0x00FF00
+    BLUE = 0x0000FF
+    YELLOW = 0xFFFF00
+    MAGENTA = 0xFF00FF
+    CYAN = 0x00FFFF
+    COLORS = (BLACK, RED, GREEN, BLUE, CYAN, MAGENTA, YELLOW, WHITE)
 
     __bitstreamArray = None
+    __bitstreamView = None
     __stateMachine = None
-    __brightnessOffset = float(1.0)
+    __dma = None
+    __dmaCtrl = None
+    __planes = None
     __rawColor = None
 
     @asm_pio(sideset_init=PIO.OUT_LOW, out_shiftdir=PIO.SHIFT_LEFT, autopull=True, pull_thresh=24)
@@ -74,10 +181,13 @@ class neopixel:
         State Machine Assembly for sending the bitstream to LEDs.
         Internal class function, not intended for external calling.
 
+        Each bit takes T1 + T2 + T3 = 6 cycles, 1250ns at 4.8MHz.
+        A 0 is 417ns high / 833ns low, a 1 is 833ns high / 417ns low,
+        which is within the WS2812B timing spec.
         """
         T1 = 2
-        T2 = 5
-        T3 = 3
+        T2 = 2
+        T3 = 2
         label("bitloop")
         out(x, 1) .side(0)[T3 - 1]
         jmp(not_x, "do_zero") .side(1)[T1 - 1]
@@ -100,63 +210,161 @@ class neopixel:
         self.__dataPin = PIN
         # Create the State Machine with the pin driving assembly program.
         self.__stateMachine = StateMachine(
-            0, self.__driver__, freq=8000000, sideset_base=Pin(self.__dataPin))
+            0, self.__driver__, freq=4800000, sideset_base=Pin(self.__dataPin))
         # Start the __stateMachine
         self.__stateMachine.active(1)
-        # Create data buffer for holding RGB Values
-        self.__bitstreamArray = array.array(
-            "I", [0 for _ in range(self.__numLED)])
+        # Create data buffer for holding RGB Values, copied from the raw
+        # zero bytes in C rather than built from a Python list
+        self.__bitstreamArray = array.array("I", bytes(4 * self.__numLED))
+        # Reused for every transfer to the state machine
+        self.__bitstreamView = memoryview(self.__bitstreamArray)
+        # Unscaled colors and brightness level of every LED, kept as four
+        # planes of one byte per LED (G, R, B, level) and only packed into
+        # the data buffer right before it is sent
+        self.__planes = bytearray(4 * self.__numLED)
+        _fill8(self.__planes, 3 * self.__numLED, 4 * self.__numLED, 0xFF)
         self.reset()
 
-    def set(self, LED_NUMBER: int = None, START_LED: int = None, STOP_LED: int = None, R: int = 0xFF, G: int = 0xFF, B: int = 0xFF, COLOR: int = None, BRIGHTNESS: float = 1):
+    @micropython.native
+    def set(self, LED_NUMBER: int = None, COLOR: int = None, BRIGHTNESS: float = 1, *, START_LED: int = None, STOP_LED: int = None, R: int = 0xFF, G: int = 0xFF, B: int = 0xFF, FLUSH: bool = True):
         """ Sets color for single, multiple or all LEDs
 
         If no argument is passed, all connected LED will be turned on with white color by default.
+        LED_NUMBER, COLOR and BRIGHTNESS may be passed positionally, e.g. set(0, neopixel.RED),
+        which avoids building a keyword argument dict for the most common calls.
+        All other parameters are keyword-only.
 
         Parameters
         ----------
         LED_NUMBER : int, optional  
             The number of LED to modify (default is None) 
 
-        START_LED, STOP_LED : int, optional  
-            The Range of LEDs to modify colors  
-
-        R, G, B : int (0-255), optional  
-            Individual color values to use  
-
         COLOR : int (0-16.7M), optional  
             24bit color value to use  
 
         BRIGHTNESS: float (0.0-1), optional  
             The brightness modifier  
 
+        START_LED, STOP_LED : int, optional, keyword-only  
+            The Range of LEDs to modify colors  
+
+        R, G, B : int (0-255), optional, keyword-only  
+            Individual color values to use  
+
+        FLUSH : bool, optional, keyword-only  
+            Send the updated colors to the strip (default is True)  
+
         Note
         ------
             If both R,G,B and COLOR parameters are provided, the COLOR parameter is assumed to be dominant.
         """
-        self.__brightnessOffset = BRIGHTNESS
         if(COLOR == None):
             COLOR = int(R << 16 | G << 8 | B)
 
-        green = int(((COLOR >> 8) & 0xFF) * BRIGHTNESS)
-        red = int(((COLOR >> 16) & 0xFF) * BRIGHTNESS)
-        blue = int((COLOR & 0xFF) * BRIGHTNESS)
-
-        RGB_SAMPLE = ((green << 16) + (red << 8) + blue)
-
         if(START_LED == None and STOP_LED == None):
             if(LED_NUMBER == None):
-                for LED_NUMBER in range(self.__numLED):
-                    self.__bitstreamArray[LED_NUMBER] = RGB_SAMPLE
+                self.setAll(COLOR, BRIGHTNESS, FLUSH)
             else:
-                self.__bitstreamArray[LED_NUMBER] = RGB_SAMPLE
+                self.setOne(LED_NUMBER, COLOR, BRIGHTNESS, FLUSH)
         else:
-            for i in range(START_LED, STOP_LED+1):
-                self.__bitstreamArray[i] = RGB_SAMPLE
+            self.setRange(START_LED, STOP_LED, COLOR, BRIGHTNESS, FLUSH)
+
+    def __span(self, START: int, STOP: int):
+        """
+        Returns the slice bounds START, STOP + 1 for an inclusive LED range.
+        Negative indices count from the last LED, out of range indices raise IndexError.
+        Internal class function, not intended for external calling.
+
+        """
+        if(START < 0):
+            START += self.__numLED
+        if(STOP < 0):
+            STOP += self.__numLED
+        if(START <= STOP and (START < 0 or STOP >= self.__numLED)):
+            raise IndexError("LED index out of range")
+        return START, STOP + 1
+
+    @micropython.native
+    def __store(self, START: int, STOP: int, COLOR: int, LEVEL: int):
+        """
+        Stores a 24bit color and brightness level for LEDs START to STOP (inclusive), one plane at a time.
+        Internal class function, not intended for external calling.
+
+        """
+        # viper does no bounds checking, so validate the range first
+        START, STOP = self.__span(START, STOP)
+        planes = self.__planes
+        n = self.__numLED
+        _fill8(planes, START, STOP, (COLOR >> 8) & 0xFF)
+        _fill8(planes, n + START, n + STOP, (COLOR >> 16) & 0xFF)
+        _fill8(planes, 2 * n + START, 2 * n + STOP, COLOR & 0xFF)
+        _fill8(planes, 3 * n + START, 3 * n + STOP, LEVEL)
+
+    @micropython.native
+    def setAll(self, COLOR: int = WHITE, BRIGHTNESS: float = 1, FLUSH: bool = True):
+        """ Sets color for all LEDs
+
+        Parameters
+        ----------
+        COLOR : int (0-16.7M), optional  
+            24bit color value to use (default is WHITE)  
+
+        BRIGHTNESS: float (0.0-1), optional  
+            The brightness modifier  
+
+        FLUSH : bool, optional  
+            Send the updated colors to the strip (default is True)  
+        """
+        self.__store(0, self.__numLED - 1, COLOR, _level(BRIGHTNESS))
+        if(FLUSH):
+            self.flush()
+
+    @micropython.native
+    def setOne(self, LED_NUMBER: int, COLOR: int = WHITE, BRIGHTNESS: float = 1, FLUSH: bool = True):
+        """ Sets color for a single LED
+
+        Parameters
+        ----------
+        LED_NUMBER : int
+            The number of LED to modify
+
+        COLOR : int (0-16.7M), optional  
+            24bit color value to use (default is WHITE)  
+
+        BRIGHTNESS: float (0.0-1), optional  
+            The brightness modifier  
+
+        FLUSH : bool, optional  
+            Send the updated colors to the strip (default is True)  
+        """
+        self.__store(LED_NUMBER, LED_NUMBER, COLOR, _level(BRIGHTNESS))
+        if(FLUSH):
+            self.flush()
+
+    @micropython.native
+    def setRange(self, START_LED: int, STOP_LED: int, COLOR: int = WHITE, BRIGHTNESS: float = 1, FLUSH: bool = True):
+        """ Sets color for a range of LEDs
 
-        self.__stateMachine.put(self.__bitstreamArray, 8)
+        Parameters
+        ----------
+        START_LED, STOP_LED : int
+            The Range of LEDs to modify colors, both inclusive
+
+        COLOR : int (0-16.7M), optional  
+            24bit color value to use (default is WHITE)  
+
+        BRIGHTNESS: float (0.0-1), optional  
+            The brightness modifier  
+
+        FLUSH : bool, optional  
+            Send the updated colors to the strip (default is True)  
+        """
+        self.__store(START_LED, STOP_LED, COLOR, _level(BRIGHTNESS))
+        if(FLUSH):
+            self.flush()
 
-    def reset(self, LED_NUMBER: int = None, START_LED: int = None, STOP_LED: int = None):
+    @micropython.native
+    def reset(self, LED_NUMBER: int = None, START_LED: int = None, STOP_LED: int = None, FLUSH: bool = True):
         """ Resets single, multiple or all LEDs
 
         If no argument is passed, all connected LED will be reset (Turned off).
@@ -168,24 +376,38 @@ class neopixel:
 
         START_LED, STOP_LED : int, optional
             The Range of LEDs to modify
+
+        FLUSH : bool, optional
+            Send the updated colors to the strip (default is True)
         """
         if(START_LED == None and STOP_LED == None):
             if(LED_NUMBER == None):
-                for LED_NUMBER in range(self.__numLED):
-                    self.__bitstreamArray[LED_NUMBER] = 0
-                self.__stateMachine.put(self.__bitstreamArray, 8)
+                START_LED, STOP_LED = 0, self.__numLED - 1
             else:
-                self.__bitstreamArray[LED_NUMBER] = 0
-                self.__stateMachine.put(self.__bitstreamArray, 8)
-        else:
-            for i in range(START_LED, STOP_LED+1):
-                self.__bitstreamArray[i] = int(0)
+                START_LED = STOP_LED = LED_NUMBER
+
+        start, stop = self.__span(START_LED, STOP_LED)
+        if(start >= stop):
+            return
+
+        # Clear the G, R and B planes, the level plane is kept
+        planes = self.__planes
+        n = self.__numLED
+        _fill8(planes, start, stop, 0)
+        _fill8(planes, n + start, n + stop, 0)
+        _fill8(planes, 2 * n + start, 2 * n + stop, 0)
+
+        if(FLUSH):
+            self.flush()
 
     # TODO: RGB-> HSL conversion for brightness manipulation
-    def setBrightness(self, LED_NUMBER: int = None, BRIGHTNESS: int = 0.5,  START_LED: int = None, STOP_LED: int = None):
+    @micropython.native
+    def setBrightness(self, LED_NUMBER: int = None, BRIGHTNESS: int = 0.5,  START_LED: int = None, STOP_LED: int = None, FLUSH: bool = True):
         """ Changes brightness of single, multiple or all LEDs
 
         If no argument is passed, all connected LED will modified.
+        The brightness applies to the colors given to set(), so calling this
+        repeatedly with the same value always gives the same result.
 
         Parameters
         ----------
@@ -197,34 +419,173 @@ class neopixel:
 
         BRIGHTNESS: float (0.0-1), optional  
             The brightness modifier
+
+        FLUSH : bool, optional
+            Send the updated colors to the strip (default is True)
         """
-        self.__brightnessOffset = BRIGHTNESS
         if(START_LED == None and STOP_LED == None):
             if(LED_NUMBER == None):
-                for LED_NUMBER in range(self.__numLED):
-                    self.__bitstreamArray[LED_NUMBER] = int(
-                        BRIGHTNESS * self.__bitstreamArray[LED_NUMBER])
+                START_LED, STOP_LED = 0, self.__numLED - 1
             else:
-                self.__bitstreamArray[LED_NUMBER] = int(
-                    BRIGHTNESS * self.__bitstreamArray[LED_NUMBER])
+                START_LED = STOP_LED = LED_NUMBER
+
+        # viper does no bounds checking, so validate the range first
+        start, stop = self.__span(START_LED, STOP_LED)
+        # Only the level plane changes, colors are rescaled when packed
+        level = 3 * self.__numLED
+        _fill8(self.__planes, level + start, level + stop, _level(BRIGHTNESS))
+
+        if(FLUSH):
+            self.flush()
+
+    def flush(self):
+        """ Sends the current colors of all LEDs to the strip
+
+        Pass FLUSH=False to set(), reset() or setBrightness() to batch several
+        changes, then call flush() once to display them together.
+
+        Parameters
+        ----------
+        None
+        """
+        self.wait()
+        _pack(self.__planes, self.__bitstreamArray, self.__numLED)
+        self.__stateMachine.put(self.__bitstreamView)
+
+    def show(self):
+        """ Starts sending the current colors of all LEDs to the strip without blocking
+
+        The buffer is fed to the state machine by DMA, so this returns at once and
+        the next frame can be computed while the current one is sent out.
+        LED changes made meanwhile are picked up by the next show() or flush().
+
+        Parameters
+        ----------
+        None
+        """
+        if(self.__dma == None):
+            # Claim a DMA channel on first use, paced by DREQ_PIO0_TX0 (state machine 0)
+            self.__dma = DMA()
+            self.__dmaCtrl = self.__dma.pack_ctrl(
+                size=2, inc_write=False, treq_sel=0)
         else:
-            for i in range(START_LED, STOP_LED+1):
-                self.__bitstreamArray[i] = int(
-                    BRIGHTNESS * self.__bitstreamArray[i])
+            self.wait()
+        _pack(self.__planes, self.__bitstreamArray, self.__numLED)
+        self.__dma.config(read=self.__bitstreamArray, write=self.__stateMachine,
+                          count=self.__numLED, ctrl=self.__dmaCtrl, trigger=True)
+
+    def wait(self):
+        """ Waits until a transfer started by show() has finished
+
+        Parameters
+        ----------
+        None
+        """
+        if(self.__dma != None):
+            while self.__dma.active():
+                pass
+
+    def deinit(self):
+        """ Stops the state machine and releases the DMA channel used by show()
+
+        Call this before creating a new driver for the same strip, otherwise
+        every instance keeps its DMA channel claimed.
+
+        Parameters
+        ----------
+        None
+        """
+        self.wait()
+        if(self.__dma != None):
+            self.__dma.close()
+            self.__dma = None
+        self.__stateMachine.active(0)
+
+    def setRaw(self, BUFFER):
+        """ Sends an already encoded buffer of GRB words to the strip
+
+        The buffer is passed to the state machine as is, without copying it into
+        the internal LED buffer. The caller is responsible for the GRB order and
+        for any brightness scaling, see encodeGRB().
+
+        Parameters
+        ----------
+        BUFFER : array.array("I"),
+            One GRB word (0xGGRRBB00) per LED, at least as many as connected LEDs
+
+        Raises
+        ------
+        TypeError
+            If BUFFER does not hold 32bit words, e.g. a bytearray
+
+        ValueError
+            If BUFFER holds fewer words than connected LEDs
+        """
+        # put() sends one FIFO word per element, so bytes would be sent one per word
+        _check_itemsize(BUFFER, 4, "BUFFER")
+        if(len(BUFFER) < self.__numLED):
+            raise ValueError("BUFFER must hold at least %d words" % self.__numLED)
+        self.wait()
+        self.__stateMachine.put(BUFFER)
 
-        self.__stateMachine.put(self.__bitstreamArray, 8)
+    def encodeGRB(self, RGB_BYTES, BUFFER, BRIGHTNESS: float = 1):
+        """ Encodes RGB byte triples into a buffer of GRB words for setRaw()
+
+        Parameters
+        ----------
+        RGB_BYTES : bytes, bytearray,
+            R, G, B bytes for each LED, e.g. a frame read from a file or socket
+
+        BUFFER : array.array("I"),
+            Destination buffer, one word per LED
+
+        BRIGHTNESS: float (0.0-1), optional
+            The brightness modifier
+
+        Returns
+        -------
+        The BUFFER argument, ready to be passed to setRaw()
+
+        Raises
+        ------
+        TypeError
+            If RGB_BYTES does not hold bytes or BUFFER does not hold 32bit words
+        """
+        # viper does no bounds checking, so len() must count the elements written
+        _check_itemsize(RGB_BYTES, 1, "RGB_BYTES")
+        _check_itemsize(BUFFER, 4, "BUFFER")
+        _encode(RGB_BYTES, BUFFER, min(len(RGB_BYTES) // 3,
+                len(BUFFER)), _quantize(BRIGHTNESS))
+        return BUFFER
 
     def test(self):
         """ Tests All Connected LEDs, one at a time.
             Useful for debugging circuit faults.
 
+            Runs testAsync() through asyncio.run(), so it must not be called
+            from a running event loop, await testAsync() there instead.
+
+        Parameters
+        ----------
+        None
+        """
+        _asyncio().run(self.testAsync())
+
+    async def testAsync(self):
+        """ Coroutine version of test(), yields to other tasks between colors.
+
         Parameters
         ----------
         None
         """
+        store = self.__store
+        colors = self.COLORS
+        flush = self.flush
+        sleep_ms = _asyncio().sleep_ms
         for j in range(0, self.__numLED):
-            for i in range(0, len(self.COLORS)):
-                self.set(LED_NUMBER=j, COLOR=self.COLORS[i])
-                time.sleep_ms(500)
+            for color in colors:
+                store(j, j, color, 0xFF)
+                flush()
+                await sleep_ms(500)
             self.reset()
 